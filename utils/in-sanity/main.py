@@ -11,19 +11,226 @@ For licensing information, see the LICENSE file in this directory.
 """
 
 import os, sys
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 import re
+import mmap
+from bisect import bisect_left
+from pathlib import Path
 from types import *
 
+# Aho-Corasick is much faster than a huge regex alternation when there are a
+# lot of unused names, but it's not in the standard library.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# numpy finds the newlines of big files a lot faster, but isn't required either.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 __version__="0.2"
 
-def lineNumber(string, start):
+# Lua calls referencing xml data, and the name they reference.
+# Lua files are searched as bytes, there is no need to decode them for that.
+_SEARCH_RE = re.compile(rb'(?P<func>pilot\.add\(|pilot\.addRaw\(|'
+                        rb'player\.addShip\(|addOutfit\(|diff\.apply\(|'
+                        rb'scom\.addPilot\()\s*(?P<hackery>pilots,|)\s*'
+                        rb'"(?P<content>[^"]+)"')
+# Literals that any _SEARCH_RE match must contain. Cheap to look for, and most
+# lua files contain none of them.
+_TOKENS = (b'pilot.add(', b'pilot.addRaw(', b'player.addShip(', b'addOutfit(',
+           b'diff.apply(', b'scom.addPilot(')
+# Lua files bigger than that (in bytes) are mmap'ed rather than read.
+_MMAP_SIZE = 256 * 1024
+# Below that many lua files, starting a process pool costs more than it saves.
+_POOL_MIN_FILES = 1000
+
+# Names accepted by each lua function, set by initScan before searching.
+_known = dict()
+
+def newLines(data):
+    """
+    Return the sorted newlines offsets in data (bytes), as a numpy array if
+    numpy is available, as a list otherwise
+    """
+    if numpy is not None:
+        return numpy.flatnonzero(numpy.frombuffer(data, numpy.uint8) == 0x0A)
+    return [match.start() for match in re.finditer(b'\n', data)]
+
+def lineNumber(newlines, start):
     """
     Return the line number and offset from a regex match
+    newlines is the value returned by newLines for the matched string
+    """
+    if numpy is not None:
+        idx = int(numpy.searchsorted(newlines, start))
+    else:
+        idx = bisect_left(newlines, start)
+    offset = start - (int(newlines[idx-1]) if idx else -1)
+    return (idx + 1, offset)
+
+def initScan(known):
+    """
+    Set the names accepted by each lua function: a dictionary of name sets by
+    function name. Must be called before searchLua in each process.
+    """
+    global _known
+    _known = known
+
+def searchLua(data):
+    """
+    Search lua source (bytes or mmap) for the calls matched by _SEARCH_RE.
+    Return a list of (func, content, lineno, offset). lineno and offset are
+    only computed for the contents not accepted by func, they are None
+    otherwise.
+    """
+    matches = list()
+    # Don't bother running the regex if it can't match anyway. ``in`` can't
+    # be used there, it doesn't look for substrings in a mmap.
+    if any(data.find(token) != -1 for token in _TOKENS):
+        newlines = None
+        for match in _SEARCH_RE.finditer(data):
+            func, content = match.group('func', 'content')
+            # Only the (few) matches get decoded
+            func = func[:-1].decode('ascii')
+            content = content.decode('utf-8', 'replace')
+            lineno = offset = None
+            if content not in _known[func]:
+                if newlines is None:
+                    newlines = newLines(data)
+                lineno, offset = lineNumber(newlines, match.start())
+            matches.append((func, content, lineno, offset))
+    return matches
+
+def scanLuaFile(file):
+    """
+    Search a lua file for the calls matched by _SEARCH_RE.
+    Return a (file, matches, ioerror) tuple, where matches is the list
+    returned by searchLua and ioerror is None unless the file couldn't be
+    read.
+    Files bigger than _MMAP_SIZE are mapped in memory instead of being read.
+    """
+    try:
+        with open(file, 'rb') as fh:
+            if os.fstat(fh.fileno()).st_size > _MMAP_SIZE:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return (file, searchLua(mm), None)
+            data = fh.read()
+    except IOError as error:
+        return (file, [], error)
+    return (file, searchLua(data), None)
+
+def scanLuaFiles(files, known, jobs=None):
     """
-    lineno = string.count('\n', 0, start) + 1
-    offset = start - string.rfind('\n', 0, start)
-    return (lineno, offset)
+    Run scanLuaFile on each file and yield the results, in order.
+    known is given to initScan. Unless jobs is 1, a pool of jobs processes is
+    used. When jobs isn't given, the pool has one process per CPU and is only
+    used when there are at least _POOL_MIN_FILES files.
+    """
+    if jobs is None:
+        if len(files) < _POOL_MIN_FILES:
+            jobs = 1
+        else:
+            jobs = os.cpu_count() or 1
+    if jobs == 1:
+        initScan(known)
+        yield from map(scanLuaFile, files)
+        return
+    # Only imported when needed, it pulls multiprocessing in.
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(jobs, initializer=initScan,
+                             initargs=(known,)) as executor:
+        yield from executor.map(scanLuaFile, files, chunksize=32)
+
+def positiveInt(value):
+    """
+    argparse type for strictly positive integers
+    """
+    try:
+        value = int(value)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise ArgumentTypeError("must be a positive integer")
+    return value
+
+def trieRegex(names):
+    """
+    Return a regex alternation matching any of the names, factored by common
+    prefixes so that it's only tried against the names that can still match.
+    The longest name is preferred.
+    """
+    trie = dict()
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, dict())
+        node[''] = True
+
+    def build(node):
+        alts = [re.escape(char) + build(child)
+                for (char, child) in node.items() if char]
+        if '' in node:
+            if not alts:
+                return ''
+            # Last, so that longer names are tried first
+            alts.append('')
+        if len(alts) == 1:
+            return alts[0]
+        return '(?:' + '|'.join(alts) + ')'
+    return build(trie)
+
+def unusedFinder(unused_data):
+    """
+    Return a function searching a string for the names in unused_data, a
+    dictionary of name lists by category. The function yields a
+    (category, name) tuple for every occurrence of every name, including
+    names found inside other names, and for every category of that name.
+    """
+    categories = dict()
+    for (category, data) in unused_data.items():
+        for name in data:
+            if name:
+                categories.setdefault(name, set()).add(category)
+
+    if not categories:
+        # Neither matcher can be built without any name
+        def search(content):
+            return iter(())
+        return search
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for (name, cats) in categories.items():
+            automaton.add_word(name, (name, cats))
+        automaton.make_automaton()
+
+        def search(content):
+            for (end, (name, cats)) in automaton.iter(content):
+                for category in cats:
+                    yield (category, name)
+        return search
+
+    # Otherwise, use a single regex over all the names. It is a lookahead so
+    # that it is tried at every position, and it matches the longest name
+    # starting there: the other names starting at the same position are the
+    # prefixes of that one.
+    prefixes = dict()
+    for name in categories:
+        prefixes[name] = [name[:i] for i in range(1, len(name))
+                          if name[:i] in categories]
+    mcobj = re.compile("(?=({0}))".format(trieRegex(categories)), re.UNICODE)
+
+    def search(content):
+        for match in mcobj.finditer(content):
+            name = match.group(1)
+            for found in [name] + prefixes[name]:
+                for category in categories[found]:
+                    yield (category, found)
+    return search
 
 class sanitizer:
 
@@ -47,25 +254,17 @@ class sanitizer:
         elif self.config['use'] == 'rawfiles':
             self.dirtyfiles_from_directory()
 
-        print('Compiling script files...',end='      ')
-        for root, dir, files in os.walk(self.config['basepath']+'/scripts/'):
-            self.addLuaFile(files, root)
+        print('Compiling script and AI Spawn files...',end='      ')
+        self.addLuaFiles(Path(self.config['basepath'], 'scripts'),
+                         Path(self.config['datpath'], 'factions/spawn'))
         print('DONE')
 
-        print('Compiling AI Spawn files...', end='      ')
-        for root, dir, files in os.walk(self.config['datpath']+'factions/spawn/'):
-            self.addLuaFile(files, root)
-        print('DONE')
-
-    def addLuaFile(self, files, root):
+    def addLuaFiles(self, *roots):
         """
-        Add a lua file in the bucket. Do nothing if the given file do not end
-        with 'lua'
+        Add all the lua files found under the given directories in the bucket.
         """
-        for filename in files:
-            if filename[-3:] == "lua":
-                realname = os.path.join(root, filename)
-                self.luaScripts.append(realname)
+        self.luaScripts.extend(str(p) for root in roots
+                                      for p in root.rglob('*.lua'))
 
     def dirtyfiles_from_directory(self):
         """
@@ -73,8 +272,7 @@ class sanitizer:
         """
         for name in "mission", "event":
             print('Compiling ' + name + ' file list like a wild viking ...', end='       ')
-            for root, dir, files in os.walk("{0}/{1}s".format(luapath, name)):
-                self.addLuaFile(files, root)
+            self.addLuaFiles(Path(luapath, name + 's'))
             print('DONE')
         return True
 
@@ -125,78 +323,52 @@ class sanitizer:
         outfitdata = outfit(datpath=self.config['datpath'],
                         verbose=self.config['verbose'], tech=otech)
 
-        rawstr = r"""
-        (?P<func>
-            pilot\.add\(|
-            pilot\.addRaw\(|
-            player\.addShip\(|
-            addOutfit\(|
-            diff\.apply\(|
-            scom\.addPilot\()\s* (?P<hackery>pilots,|
-        )\s*"(?P<content>[^"]+)"""
-
-        search_cobj = re.compile(rawstr, re.VERBOSE| re.UNICODE)
+        # Lua function name -> reader in charge of validating its argument
+        finder = {
+            'pilot.add': fleetdata,
+            'scom.addPilot': fleetdata,
+            'pilot.addRaw': shipdata,
+            'addOutfit': outfitdata,
+            'player.addShip': shipdata,
+            'diff.apply': udata,
+        }
+        known = {func: obj.nameSet for (func, obj) in finder.items()}
 
-        entry = dict()
         errors = list()
 
-        # XXX This variable will stock all the lua files. This could lead to a
-        # massive memory consumption.
-        line = dict()
+        # Only the names of the files successfully read are kept, their
+        # content is read again when looking for unused data.
+        scanned = list()
 
         print("Blind check now ...")
-        for file in self.luaScripts:
+        # Reading and searching the files may be done by a pool of workers,
+        # the validation is done here as it updates the readers.
+        results = scanLuaFiles(self.luaScripts, known, self.config.get('jobs'))
+        for (file, matches, ioerror) in results:
             if self.config['verbose']:
                 print("Processing file {0}...".format(file), end='       ')
-            if len(errors) > 0:
-                for error in errors:
-                    print(error, file=sys.stderr)
-                errors = list()
-
-            try:
-                line[file] = open(file, 'rU').read()
-                haserror=False
-                for match in search_cobj.finditer(line[file]):
-                    lineno, offset = lineNumber(line[file], match.start())
-                    info = dict(
-                            lineno=lineno,
-                            offset=offset,
-                            func=match.group('func')[:-1],
-                            content= match.group('content'),
-                            file=file
-                    )
-
-                    if info['func'] == 'pilot.add':
-                        if not fleetdata.find(info['content']):
-                            haserror=True
-                    if info['func'] == 'scom.addPilot':
-                        if not fleetdata.find(info['content']):
-                            haserror=True
-                    if info['func'] == 'pilot.addRaw':
-                        if not shipdata.find(info['content']):
-                            haserror=True
-                    if info['func'] == 'addOutfit':
-                        if not outfitdata.find(info['content']):
-                            haserror=True
-                    if info['func'] == 'player.addShip':
-                        if not shipdata.find(info['content']):
-                            haserror=True
-                    if info['func'] == 'diff.apply':
-                        if not udata.find(info['content']):
-                            haserror=True
-
-                    if haserror:
-                        errors.append(self._errorstring % info)
-                        haserror=False
-
-            except IOError as error:
-                print("I/O error: {0}".format(error), file=sys.stderr)
-            except:
-                raise
+            if ioerror is not None:
+                print("I/O error: {0}".format(ioerror), file=sys.stderr)
+            else:
+                scanned.append(file)
+                for (func, content, lineno, offset) in matches:
+                    if not finder[func].find(content):
+                        errors.append(self._errorstring % dict(
+                                lineno=lineno,
+                                offset=offset,
+                                func=func,
+                                content=content,
+                                file=file
+                        ))
 
             if self.config['verbose']:
                 print("DONE")
 
+        # Errors are in file order, then in line order for each file.
+        if errors:
+            sys.stderr.write('\n'.join(errors) + '\n')
+        del(errors)
+
         print('Verifying ...')
         unused_data = dict()
 
@@ -205,36 +377,28 @@ class sanitizer:
                    (shipdata, 'ship'), (outfitdata, 'outfit'))
         for obj, key in tocheck:
             tmp = obj.get_unused()
-            if len(tmp) > 0:
+            if tmp:
                 unused_data.update({key: tmp})
         del(tmp)
 
-        if len(unused_data) > 0:
-           # Create the regex
-            mcobj = dict()
-            for (category, data) in unused_data.items():
-                regex = r"""
-                (?P<{0}>%s)
-                """.format(category)
-                rname = ''
-                uniqList = list()
-                for name in data:
-                    name = name.replace(' ', "\s")
-                    rname = rname + name + '|'
-                    if name not in uniqList:
-                        uniqList.append(name)
-                regex = regex % rname[:-1]
-                mcobj.update({category: re.compile(regex, re.VERBOSE| re.UNICODE)})
-
-            # For each file, run each regex
+        if unused_data:
+            search = unusedFinder(unused_data)
+            obj_by_key = {key: obj for (obj, key) in tocheck}
+
+            # For each file, look for the unused names
             # If an item is found, that item is set to the unknown status
-            for (file, content) in line.items():
-                for (category, cobj) in mcobj.items():
-                    for match in cobj.finditer(content):
-                        groups = match.groupdict()
-                        for (obj, key) in tocheck:
-                            if key == category:
-                                obj.set_unknown(groups[category])
+            for file in scanned:
+                try:
+                    # Decoded like the blind check does, so that a file with
+                    # invalid utf-8 is still searched.
+                    content = Path(file).read_bytes().decode('utf-8',
+                                                              'replace')
+                except IOError as error:
+                    print("I/O error: {0}: {1}".format(
+                              file, error.strerror or error), file=sys.stderr)
+                    continue
+                for (category, name) in search(content):
+                    obj_by_key[category].set_unknown(name)
 
         outfitdata.showMissingTech()
         shipdata.showMissingTech()
@@ -269,6 +433,12 @@ if __name__ == "__main__":
     parser.add_argument('--version', action='version',
                         version='%(prog)s '+__version__)
     parser.add_argument('--verbose', action='store_true', default=False)
+    parser.add_argument('--jobs', '-j', type=positiveInt, default=None,
+                        help="""
+                        Number of processes used to search the lua files.
+                        Defaults to the number of CPUs, or to 1 (no process
+                        pool) when there are fewer than {0} lua files.
+                        """.format(_POOL_MIN_FILES))
     parser.add_argument('basepath',
                         help='Path to naev/ directory')
 
@@ -278,6 +448,6 @@ if __name__ == "__main__":
     luapath = os.path.abspath(basepath + '/dat/')
     insanity = sanitizer(basepath=basepath, luapath=luapath,
                          verbose=args.verbose,use=args.use,
-                         show_unused=args.show_unused)
+                         show_unused=args.show_unused, jobs=args.jobs)
 
     insanity.dah_doctor()
@@ -27,6 +27,7 @@ class readers:
         """
         self._verbose=verbose
         self.nameList=list()
+        self.nameSet=frozenset()
 
         if self.xmlData is None:
             if type(xmlFiles) is not type(list()):
@@ -39,29 +40,11 @@ class readers:
     def get_unused(self):
         """
         this method return a list containing all the unused stuff.
-        use it wisely, it'll regenerate all the list. Could be quite time
-        consuming with a lot of data.
+        use it wisely, it'll regenerate all the list.
         """
-        tmp = self.nameList
-        try:
-            for name in self.used:
-                # XXX TODO WARNING : this is a 'fix'. But I need to understand
-                # why that name could not be in nameList
-                if name in tmp:
-                    tmp.remove(name)
-            for name in self.unknown:
-                if name in tmp:
-                    tmp.remove(name)
-        except ValueError:
-            print('ValueError: %s not in %s used list' %
-                        (name, self._componentName))
-            print('Debug info:')
-            print("\ntmp: %s" % (tmp))
-            print("\nNameList: %s" % (self.nameList))
-            print("\nUsed list: %s" % (self.used))
-
-            raise
-        return tmp
+        used = set(self.used)
+        used.update(self.unknown)
+        return [name for name in self.nameList if name not in used]
 
     def show_unused(self):
         if len(self.unknown) > 0:
@@ -78,7 +61,7 @@ class readers:
         Meaning it is probably used by a lua script, but this tool can't be
         certain (i.e. name used in a variable).
         """
-        if name in self.nameList and name not in self.used:
+        if name in self.nameSet and name not in self.used:
             if name not in self.unknown:
                 self.v("SET ''%s`` as UNKNOWN" % name)
                 self.unknown.append(name)
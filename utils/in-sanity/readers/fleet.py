@@ -10,19 +10,19 @@ class fleet(readers):
         fleetXml = os.path.join(config['datpath'], 'fleet.xml')
         readers.__init__(self, fleetXml, config['verbose'])
         self._componentName = 'fleet'
-        self.used=list()
+        self.used=set()
         self.unknown=list()
 
         self.nameList = list()
         print('Compiling fleet list ...',end='      ')
         for fleet in self.xmlData.findall('fleet'):
             self.nameList.append(fleet.attrib['name'])
+        self.nameSet = frozenset(self.nameList)
         print("DONE")
 
     def find(self, name):
-        if name in self.nameList:
-            if name not in self.used:
-                self.used.append(name)
+        if name in self.nameSet:
+            self.used.add(name)
             return True
         else:
             return False
@@ -13,7 +13,7 @@ class outfit(readers):
         self._componentName = 'outfit'
         self._tech = config['tech']
 
-        self.used = list()
+        self.used = set()
         self.unknown = list()
 
         self.nameList = list()
@@ -25,16 +25,16 @@ class outfit(readers):
             if not self._tech.findItem(outfit.attrib['name']):
                 self.missingTech.append(outfit.attrib['name'])
             else:
-                self.used.append(outfit.attrib['name'])
+                self.used.add(outfit.attrib['name'])
+        self.nameSet = frozenset(self.nameList)
         self.missingTech.sort()
         print("DONE")
 
     def find(self, name):
-        if name in self.nameList:
+        if name in self.nameSet:
             if name in self.missingTech:
                 self.missingTech.remove(name)
-            if name not in self.used:
-                self.used.append(name)
+            self.used.add(name)
             return True
         else:
             return False
@@ -93,10 +93,9 @@ class tech(items):
         items.__init__(self, **config)
         self.assets = assets(techItem=self.findItem, **config)
 
-        self.techItems = list()
+        self.techItems = set()
         for item in self.xmlData.findall('tech/item'):
-            if item.text not in self.techItems:
-                self.techItems.append(item.text)
+            self.techItems.add(item.text)
 
         print('techs validation ...')
         self.assets.validateTechs(self.itemNames)
@@ -119,12 +118,11 @@ class assets(items):
         self.ssys.validateAssets(self.itemNames)
 
     def validateTechs(self, techNames):
-        techList = list()
+        techList = set()
         for techs in self.xmlData:
             techs = techs.getroot()
             for tech in techs.findall('tech/item'):
-                if tech.text not in techList:
-                    techList.append(tech.text)
+                techList.add(tech.text)
 
         for tech in techNames:
             if self.techItem(tech):
@@ -140,10 +138,10 @@ class ssys(readers):
 
     def validateAssets(self, assetNames):
         # TODO check for empty assets[/asset] <- return '\n  ' if empty
-        assetList = list()
+        assetList = set()
         for assets in self.xmlData:
             for asset in assets.findall('ssys/assets/asset/'):
-                assetList.append(asset.text)
+                assetList.add(asset.text)
 
         for asset in assetNames:
             if asset not in assetList and not self._unidiff.findAsset(asset):
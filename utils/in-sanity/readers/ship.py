@@ -12,7 +12,7 @@ class ship(readers):
         self._componentName = 'ship'
         self._tech = config['tech']
         self._fleet = config['fleetobj']
-        self.used = list()
+        self.used = set()
         self.unknown = list()
 
         self.nameList = list()
@@ -29,7 +29,7 @@ class ship(readers):
                     if not self._tech.findItem(name):
                         self.missingTech.append(name)
                     else:
-                        self.used.append(name)
+                        self.used.add(name)
                 else:
                     self.missingLua.append(name)
                     if self._tech.findItem(name):
@@ -39,22 +39,21 @@ class ship(readers):
             raise e
         else:
             print("DONE")
+        self.nameSet = frozenset(self.nameList)
 
         # Remove ships that are in fleets.
         for ship in list(self.missingLua):
             if self._fleet.findPilots(ship=ship):
                 self.missingLua.remove(ship)
-                if ship not in self.used:
-                    self.used.append(ship)
+                self.used.add(ship)
 
         self.missingLua.sort()
 
     def find(self, name):
-        if name in self.nameList:
+        if name in self.nameSet:
             if name in self.missingLua:
                 self.missingLua.remove(name)
-            if name not in self.used:
-                self.used.append(name)
+            self.used.add(name)
             return True
         else:
             return False
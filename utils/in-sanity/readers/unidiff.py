@@ -10,29 +10,29 @@ class unidiff(readers):
         uXml = os.path.join(config['datpath'], 'unidiff.xml')
         readers.__init__(self, uXml, config['verbose'])
         self._componentName = 'unidiff'
-        self.used = list()
+        self.used = set()
         self.unknown = list()
 
         self.nameList = list()
         print('Compiling unidiff ...',end='      ')
         for diff in self.xmlData.findall('unidiff'):
             self.nameList.append(diff.attrib['name'])
-        self.techList = list()
+        self.nameSet = frozenset(self.nameList)
+        self.techList = set()
         for diff in self.xmlData.findall('unidiff/tech/add'):
-            self.techList.append(diff.text)
-        self.assetList = list()
+            self.techList.add(diff.text)
+        self.assetList = set()
         for diff in self.xmlData.findall('unidiff/system/asset'):
-            self.assetList.append(diff.attrib['name'])
+            self.assetList.add(diff.attrib['name'])
         print("DONE")
 
     def find(self, name):
         """
         return True if name is found in unidiff.xml
-        And if so, add name in the used list.
+        And if so, add name in the used set.
         """
-        if name in self.nameList:
-            if name not in self.used:
-                self.used.append(name)
+        if name in self.nameSet:
+            self.used.add(name)
             return True
         else:
             return False